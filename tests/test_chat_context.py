@@ -0,0 +1,81 @@
+from utils.chat_context import ReceiptContext
+
+
+def _context(*merchants):
+    context = ReceiptContext()
+    for idx, merchant in enumerate(merchants, start=1):
+        context.add_receipt(f'image_{idx}.jpg', {
+            'restaurant_name': merchant,
+            'items': [{'name': 'Nasi Goreng', 'price': 28000.0 + idx, 'quantity': 1}],
+            'subtotal': 28000.0 + idx,
+            'tax': 0.0,
+            'service_charge': 0.0,
+            'total': 28000.0 + idx,
+        })
+    return context
+
+
+def test_generic_merchant_words_do_not_match():
+    context = _context('The Harvest', 'CAFE KOPI', 'Rumah Makan Padang Sederhana')
+    assert context.select_receipts('what is the total?') == []
+    assert context.select_receipts('mau makan kopi di cafe') == []
+
+
+def test_distinctive_merchant_word_or_full_name_matches():
+    context = _context('The Harvest', 'CAFE KOPI', 'Rumah Makan Padang Sederhana')
+    assert context.select_receipts('how much at harvest?') == ['R1']
+    assert context.select_receipts('receipt from cafe kopi') == ['R2']
+    assert context.select_receipts('nasi padang kemarin') == ['R3']
+
+
+def test_receipt_id_and_amount_match():
+    context = _context('The Harvest', 'CAFE KOPI')
+    assert context.select_receipts('explain r2') == ['R2']
+    assert context.select_receipts('what was the 28.001 charge?') == ['R1']
+    assert context.select_receipts('hello', new_ids=['R1']) == ['R1']
+
+
+def test_receipts_are_encoded_compactly_and_replayed_by_id():
+    context = _context('CAFE KOPI')
+    message = context.build_user_message('total?', ['R1'])
+    assert '"m":"CAFE KOPI"' in message
+    assert '"T":28001' in message
+    assert ReceiptContext.history_text('total?', ['R1']) == 'total?\n[Receipts: R1]'
+
+
+def test_date_matches_across_formats():
+    context = _context('CAFE KOPI', 'WARTEG BAHARI')
+    context.add_receipt('image_3.jpg', "{'restaurant_name':'SATE PAK KUMIS','date':'2025-03-12','items':[],"
+                                       "'subtotal':0.0,'tax':0.0,'service_charge':0.0,'total':0.0}")
+    assert context.select_receipts('what did I buy on 12/03/2025?') == ['R3']
+    assert context.select_receipts('struk tgl 12-3-25') == ['R3']
+    assert 'R3|SATE PAK KUMIS|2025-03-12|0' in context.build_system_prompt('You are a helpful assistant.')
+
+
+def test_recent_history_keeps_whole_turns_and_skips_empty_ones():
+    context = ReceiptContext(max_history_turns=2)
+    history = [
+        {'role': 'assistant', 'content': 'orphaned reply'},
+        {'role': 'user', 'content': 'first'},
+        {'role': 'assistant', 'content': 'first reply'},
+        {'role': 'user', 'content': 'second'},
+        {'role': 'assistant', 'content': 'second reply'},
+        {'role': 'user', 'content': ReceiptContext.history_text('', [])},
+        {'role': 'user', 'content': 'third'},
+        {'role': 'assistant', 'content': 'third reply'},
+    ]
+    assert context.recent_history(history) == history[3:5] + history[6:]
+    assert context.recent_history(history[:3]) == history[1:3]
+
+
+
+def test_short_names_times_and_counts_do_not_match():
+    context = _context('A', 'Cafe')
+    context.add_receipt('image_3.jpg', {'restaurant_name': 'SATE PAK KUMIS', 'items': [
+        {'name': 'Sate Ayam', 'price': 25.0, 'quantity': 2}], 'subtotal': 50.0, 'total': 50.0})
+    assert context.select_receipts('is a receipt here?') == []
+    assert context.select_receipts('any cafe nearby?') == []
+    assert context.select_receipts('what happened at 19:25') == []
+    assert context.select_receipts('I bought 2 and paid 50') == []
+    assert context.select_receipts('was it 28rb?') == []
+    assert context.select_receipts('was it 28.001 at 19:25?') == ['R1']
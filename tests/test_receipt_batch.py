@@ -0,0 +1,118 @@
+import json
+
+import numpy as np
+import pytest
+
+from utils.receipt_batch import (
+    ReceiptBatch,
+    export_clean_receipts_parquet,
+    reconcile_receipts,
+)
+from utils.receipt_json import load_receipt_json
+
+
+def _receipt(**overrides):
+    receipt = {
+        'restaurant_name': 'WARTEG BAHARI',
+        'items': [
+            {'name': 'Nasi Gudeg', 'price': 15000.0, 'quantity': 1},
+            {'name': 'Es Teh', 'price': 5000.0, 'quantity': 2},
+        ],
+        'subtotal': 25000.0,
+        'tax': 2500.0,
+        'service_charge': 0.0,
+        'total': 27500.0,
+    }
+    receipt.update(overrides)
+    return json.dumps(receipt)
+
+
+def _reasons(receipts):
+    result = reconcile_receipts(ReceiptBatch.from_receipts(receipts))
+    return {entry['id']: entry['reasons'] for entry in result.reparse_list()}
+
+
+def test_load_receipt_json_accepts_prompt_format():
+    text = ("{'restaurant_name':'CAFE KOPI','items':[{'name':\"Kopi Tubruk\",'price':12000.0,'quantity':2}],"
+            "'subtotal':24000.0,'tax':0.0,'service_charge':0.0,'total':24000.0}")
+    data = load_receipt_json(text)
+    assert data['restaurant_name'] == 'CAFE KOPI'
+    assert data['items'][0] == {'name': 'Kopi Tubruk', 'price': 12000.0, 'quantity': 2}
+
+
+def test_load_receipt_json_handles_apostrophes_and_python_literals():
+    assert load_receipt_json("{'restaurant_name': \"Mom's\", 'date': None}") == {'restaurant_name': "Mom's", 'date': None}
+    assert load_receipt_json('{"restaurant_name": "O\'Reilly"}') == {'restaurant_name': "O'Reilly"}
+    assert load_receipt_json("{'restaurant_name': 'Mom\\'s', 'total': 1}") == {'restaurant_name': "Mom's", 'total': 1}
+    assert load_receipt_json("{'items': [\"x','y\"]}") == {'items': ["x','y"]}
+    assert load_receipt_json('not a receipt') is None
+
+
+@pytest.mark.parametrize('receipts', [[], ['garbage', "{'items':[],'subtotal':1,'total':1}"]])
+def test_reconcile_empty_or_all_bad_batch(receipts):
+    result = reconcile_receipts(ReceiptBatch.from_receipts(receipts))
+    assert len(result.reparse_list()) == len(receipts)
+    assert not result.clean.any()
+
+
+def test_rupiah_string_amounts_are_normalized():
+    batch = ReceiptBatch.from_receipts([_receipt(
+        items=[{'name': 'Nasi Gudeg', 'price': 'Rp 15.000', 'quantity': 1},
+               {'name': 'Es Teh', 'price': 'IDR 5.000', 'quantity': '2'}],
+        subtotal='25.000', tax='2.500,00', total='Rp27.500',
+    )])
+    np.testing.assert_allclose(batch.item_price, [15000.0, 5000.0])
+    np.testing.assert_allclose(batch.items_total(), [25000.0])
+    assert reconcile_receipts(batch).clean.all()
+
+
+def test_null_quantity_counts_as_one():
+    batch = ReceiptBatch.from_receipts([_receipt(
+        items=[{'name': 'Nasi Gudeg', 'price': 25000.0, 'quantity': None}],
+    )])
+    np.testing.assert_allclose(batch.item_quantity, [1.0])
+    assert reconcile_receipts(batch).clean.all()
+
+
+def test_each_check_flags_its_receipt():
+    reasons = _reasons([
+        _receipt(),
+        'garbage',
+        _receipt(total=None),
+        _receipt(items=[]),
+        _receipt(tax=-2500.0, total=22500.0),
+        _receipt(subtotal=30000.0, tax=3000.0, total=33000.0),
+        _receipt(total=30000.0),
+        _receipt(tax=10000.0, total=35000.0),
+        _receipt(items=[{'name': 'Nasi Gudeg', 'price': None, 'quantity': 1}]),
+        _receipt(tax=None, service_charge=None, total=25000.0),
+    ])
+    assert '0' not in reasons
+    assert reasons['1'] == ['unparseable']
+    assert reasons['2'] == ['missing_amount']
+    assert reasons['3'] == ['no_items']
+    assert 'negative_amount' in reasons['4']
+    assert reasons['5'] == ['items_subtotal_mismatch']
+    assert reasons['6'] == ['total_mismatch']
+    assert reasons['7'] == ['tax_rate_outlier']
+    assert reasons['8'] == ['missing_amount']
+    assert '9' not in reasons
+
+
+def test_export_clean_receipts_parquet_round_trip(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    batch = ReceiptBatch.from_receipts(
+        [_receipt(restaurant_name=123), _receipt(total=1.0)],
+        ids=['good', 'bad'],
+    )
+    result = reconcile_receipts(batch)
+    receipts_path = tmp_path / 'receipts.parquet'
+    items_path = tmp_path / 'items.parquet'
+    assert export_clean_receipts_parquet(result, str(receipts_path), str(items_path)) == 1
+    receipts = pq.read_table(receipts_path).to_pylist()
+    items = pq.read_table(items_path).to_pylist()
+    assert [r['receipt_id'] for r in receipts] == ['good']
+    assert receipts[0]['restaurant_name'] == '123'
+    assert receipts[0]['items_total'] == 25000.0
+    assert [(i['name'], i['line_total']) for i in items] == [('Nasi Gudeg', 15000.0), ('Es Teh', 10000.0)]
+    assert {i['receipt_id'] for i in items} == {'good'}
@@ -7,6 +7,7 @@ import streamlit as st
 
 # Use OpenAIService from utils
 from utils.openai_service import OpenAIService
+from utils.chat_context import ReceiptContext
 from receipt_parsing import receipt_parsing_from_bytes
 
 # ------------ Helpers ------------
@@ -17,6 +18,8 @@ def ensure_session():
         st.session_state["parsed_receipts"] = []
     if "parsed_receipts_counter" not in st.session_state:
         st.session_state["parsed_receipts_counter"] = 0
+    if "receipt_context" not in st.session_state:
+        st.session_state["receipt_context"] = ReceiptContext()
 
 
 def _safe_json_filename(name: str) -> str:
@@ -107,7 +110,11 @@ with st.sidebar:
     with col_b:
         if st.download_button(
             label="Download chat",
-            data=json.dumps(st.session_state.get("messages", []), ensure_ascii=False, indent=2),
+            data=json.dumps(
+                [{k: v for k, v in m.items() if k != "openai_text"} for m in st.session_state.get("messages", [])],
+                ensure_ascii=False,
+                indent=2,
+            ),
             file_name="messages.json",
             mime="application/json",
         ):
@@ -177,9 +184,12 @@ def handle_submit(prompt: str, uploaded_files):
         return
 
     add_message("user", text=prompt or "", images=images_b64)
+    user_msg = st.session_state["messages"][-1]
     render_chat_history()
 
+    receipt_context = st.session_state["receipt_context"]
     parsed_receipts = []
+    new_receipt_ids = []
     if uploaded_raw:
         counter = st.session_state.get("parsed_receipts_counter", 0)
         for idx, raw in enumerate(uploaded_raw, start=1):
@@ -198,6 +208,7 @@ def handle_submit(prompt: str, uploaded_files):
                     "content": parsed_content,
                     "key": f"parsed-receipt-{counter}",
                 })
+                new_receipt_ids.append(receipt_context.add_receipt(display_name, parse_result.content))
                 add_message(
                     "assistant",
                     text=f"Parsed receipt ({display_name}):\n```json\n{parsed_content}\n```",
@@ -219,23 +230,28 @@ def handle_submit(prompt: str, uploaded_files):
 
     try:
         openai_service = OpenAIService()
-        openai_service.set_system_prompt(system_prompt)
+        openai_service.set_system_prompt(receipt_context.build_system_prompt(system_prompt))
 
+        # Replay past turns in compact form (receipt IDs instead of receipt bodies), windowed
+        history = []
         for msg in st.session_state["messages"]:
-            if msg["role"] == "system" or msg.get("skip_openai"):
+            if msg is user_msg or msg["role"] == "system" or msg.get("skip_openai"):
+                continue
+            if "openai_text" in msg:
+                history.append({"role": msg["role"], "content": msg["openai_text"]})
                 continue
             for part in msg["parts"]:
                 if part["type"] == "text":
-                    openai_service.add_message_to_history(msg["role"], part["text"])
+                    history.append({"role": msg["role"], "content": part["text"]})
+        for entry in receipt_context.recent_history(history):
+            openai_service.add_message_to_history(entry["role"], entry["content"])
 
-        user_text = prompt or ""
+        question = prompt or ""
         if images_b64:
-            user_text += "\n[User uploaded image(s) attached]"
-        if parsed_receipts:
-            for entry in parsed_receipts:
-                name = entry.get("name", "receipt")
-                content = entry.get("content", "")
-                user_text += f"\n[Parsed receipt {name}: {content}]"
+            question += "\n[User uploaded image(s) attached]"
+        receipt_ids = receipt_context.select_receipts(question, new_receipt_ids)
+        user_text = receipt_context.build_user_message(question, receipt_ids)
+        user_msg["openai_text"] = ReceiptContext.history_text(question, receipt_ids)
 
         result = generate_response_with_spinner(openai_service, user_text)
         add_message("assistant", text=result.content)
@@ -0,0 +1,194 @@
+import json
+import re
+from typing import Optional, List, Dict, Any, Union
+
+from utils.receipt_json import load_receipt_json, parse_amount
+
+# Compact chat context for parsed receipts. Each receipt gets a short ID and is
+# sent to the model once, minified with abbreviated keys; afterwards the
+# conversation only refers to it by ID, and later turns re-attach just the
+# receipts the question matches. The system prompt, key legend and receipt
+# catalog go first and only ever grow at the end, so the prompt prefix stays
+# byte-identical across turns for provider-side prompt caching.
+
+RECEIPT_KEY_ABBREVIATIONS = {
+    'restaurant_name': 'm',
+    'date': 'd',
+    'items': 'i',
+    'name': 'n',
+    'price': 'p',
+    'quantity': 'q',
+    'subtotal': 's',
+    'tax': 't',
+    'service_charge': 'c',
+    'total': 'T',
+}
+
+RECEIPT_KEY_LEGEND = (
+    'Receipts are referenced by ID (R1, R2, ...) and encoded as compact JSON with keys: '
+    + ', '.join(f'{short}={key}' for key, short in RECEIPT_KEY_ABBREVIATIONS.items())
+    + '. Item price is per unit. A receipt body is only attached when relevant; '
+    'otherwise use the catalog below.'
+)
+
+_RECEIPT_ID_PATTERN = re.compile(r'\bR(\d+)\b', re.IGNORECASE)
+_DATE_PATTERN = re.compile(r'(?<![\d.,])(\d{1,4}[\/\-\.]\d{1,2}[\/\-\.]\d{1,4})(?![\d.,])')
+# Numbers touching ':' are times ("19:25"), not amounts
+_AMOUNT_PATTERN = re.compile(r'(?<![\w.,:])(\d[\d.,]*)(?![\d.,]*:)\s*(k|rb|ribu|jt|juta)?\b', re.IGNORECASE)
+_AMOUNT_MULTIPLIERS = {'k': 1_000, 'rb': 1_000, 'ribu': 1_000, 'jt': 1_000_000, 'juta': 1_000_000}
+# Bare numbers below this are counts or quantities, not Rupiah amounts, unless they carry a suffix
+_MIN_BARE_AMOUNT = 1_000
+# Merchant words too common to identify a receipt on their own; a merchant made only of
+# these still matches when the question contains its whole name, unless that name is a
+# single generic word or shorter than the minimum length.
+_MERCHANT_MIN_WORD_LENGTH = 4
+_MERCHANT_GENERIC_WORDS = {
+    'the', 'and', 'dan', 'yang', 'with', 'from', 'store', 'shop', 'toko', 'mart', 'market', 'pasar',
+    'cafe', 'coffee', 'kopi', 'kedai', 'resto', 'restaurant', 'restoran', 'rumah', 'makan', 'warung',
+    'warteg', 'bakery', 'kitchen', 'dapur', 'house', 'food', 'foods', 'indonesia', 'jakarta',
+    'cabang', 'branch', 'total', 'receipt', 'struk', 'nota',
+}
+
+
+def _abbreviate(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {RECEIPT_KEY_ABBREVIATIONS.get(k, k): _abbreviate(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_abbreviate(v) for v in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def encode_receipt(data: Dict[str, Any]) -> str:
+    return json.dumps(_abbreviate(data), ensure_ascii=False, separators=(',', ':'))
+
+
+def _parse_amount(number: str, suffix: Optional[str]) -> Optional[float]:
+    amount = parse_amount(number.rstrip('.,'))
+    if amount is None:
+        return None
+    return amount * _AMOUNT_MULTIPLIERS.get((suffix or '').lower(), 1)
+
+
+def _merchant_keywords(merchant: str) -> List[str]:
+    return [w for w in re.findall(r'\w+', merchant)
+            if len(w) >= _MERCHANT_MIN_WORD_LENGTH and not w.isdigit() and w not in _MERCHANT_GENERIC_WORDS]
+
+
+def _date_key(text: str) -> List[int]:
+    parts = [int(p) for p in re.split(r'[\/\-\.]', text) if p.isdigit()]
+    return sorted(p % 100 if p >= 1000 else p for p in parts)
+
+
+class ReceiptContext:
+    def __init__(self, max_history_turns: int = 3, max_receipts_per_turn: int = 5):
+        self.max_history_turns = max_history_turns
+        self.max_receipts_per_turn = max_receipts_per_turn
+        self._receipts: List[Dict[str, Any]] = []
+
+    def add_receipt(self, name: str, content: Union[str, Dict[str, Any]]) -> str:
+        """Register a parsed receipt and return its short ID."""
+        receipt_id = f'R{len(self._receipts) + 1}'
+        data = load_receipt_json(content)
+        if data is not None:
+            encoded = encode_receipt(data)
+        else:
+            encoded = ' '.join(str(content).split())
+        self._receipts.append({'id': receipt_id, 'name': name, 'data': data or {}, 'encoded': encoded})
+        return receipt_id
+
+    def _catalog_line(self, receipt: Dict[str, Any]) -> str:
+        data = receipt['data']
+        merchant = data.get('restaurant_name') or receipt['name']
+        total = _abbreviate(data.get('total'))
+        return f"{receipt['id']}|{merchant}|{data.get('date') or '-'}|{total if total is not None else '-'}"
+
+    def build_system_prompt(self, system_prompt: Optional[str]) -> str:
+        """Stable prefix: system prompt, key legend, then the append-only receipt catalog."""
+        parts = [system_prompt] if system_prompt else []
+        if self._receipts:
+            parts.append(RECEIPT_KEY_LEGEND)
+            catalog = '\n'.join(self._catalog_line(r) for r in self._receipts)
+            parts.append(f'Receipt catalog (id|merchant|date|total):\n{catalog}')
+        return '\n\n'.join(parts)
+
+    def _matches(self, receipt: Dict[str, Any], question: str, amounts: List[float],
+                 dates: List[List[int]]) -> bool:
+        data = receipt['data']
+        lowered = question.lower()
+        merchant = str(data.get('restaurant_name') or '').lower()
+        if (len(merchant) >= _MERCHANT_MIN_WORD_LENGTH and merchant not in _MERCHANT_GENERIC_WORDS
+                and re.search(rf'(?<!\w){re.escape(merchant)}(?!\w)', lowered)):
+            return True
+        words = set(re.findall(r'\w+', lowered))
+        if any(w in words for w in _merchant_keywords(merchant)):
+            return True
+        if dates and data.get('date') and _date_key(str(data['date'])) in dates:
+            return True
+        if amounts:
+            values = [data.get('total'), data.get('subtotal')]
+            values += [item.get('price') for item in data.get('items') or [] if isinstance(item, dict)]
+            for value in values:
+                if isinstance(value, (int, float)) and any(abs(value - a) < 0.5 for a in amounts):
+                    return True
+        return False
+
+    def select_receipts(self, question: str, new_ids: Optional[List[str]] = None) -> List[str]:
+        """Receipts to attach this turn: newly uploaded ones plus those the question refers to."""
+        selected = list(new_ids or [])
+        if not question or not self._receipts:
+            return selected
+        known = {r['id'] for r in self._receipts}
+        for match in _RECEIPT_ID_PATTERN.finditer(question):
+            receipt_id = f'R{int(match.group(1))}'
+            if receipt_id in known and receipt_id not in selected:
+                selected.append(receipt_id)
+        dates = [_date_key(d) for d in _DATE_PATTERN.findall(question)]
+        without_dates = _DATE_PATTERN.sub(' ', question)
+        amounts = []
+        for number, suffix in _AMOUNT_PATTERN.findall(without_dates):
+            amount = _parse_amount(number, suffix)
+            if amount and (suffix or amount >= _MIN_BARE_AMOUNT):
+                amounts.append(amount)
+        for receipt in reversed(self._receipts):
+            if len(selected) >= self.max_receipts_per_turn:
+                break
+            if receipt['id'] not in selected and self._matches(receipt, question, amounts, dates):
+                selected.append(receipt['id'])
+        return selected
+
+    def build_user_message(self, question: str, receipt_ids: List[str]) -> str:
+        by_id = {r['id']: r for r in self._receipts}
+        lines = [question] if question else []
+        for receipt_id in receipt_ids:
+            receipt = by_id.get(receipt_id)
+            if receipt:
+                lines.append(f"[Receipt {receipt_id} ({receipt['name']}): {receipt['encoded']}]")
+        return '\n'.join(lines)
+
+    @staticmethod
+    def history_text(question: str, receipt_ids: List[str]) -> str:
+        """What a past turn looks like when replayed: the question plus receipt IDs only."""
+        if not receipt_ids:
+            return question
+        return f"{question}\n[Receipts: {', '.join(receipt_ids)}]".strip()
+
+    def recent_history(self, history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """The last max_history_turns user turns with their replies, skipping empty entries.
+
+        A reply whose question was trimmed away is dropped rather than replayed on its own.
+        """
+        if self.max_history_turns <= 0:
+            return []
+        turns: List[List[Dict[str, str]]] = []
+        for entry in history:
+            if not entry['content'].strip():
+                continue
+            if entry['role'] == 'user' or not turns:
+                turns.append([entry])
+            else:
+                turns[-1].append(entry)
+        if turns and turns[0][0]['role'] != 'user':
+            turns = turns[1:]
+        return [entry for turn in turns[-self.max_history_turns:] for entry in turn]
@@ -27,11 +27,13 @@ INDONESIAN RECEIPT PARSING RULES (Enhanced Image Processing):
 13. 🚫 Do NOT wrap response in ```json``` code blocks - return raw JSON only
 14. 🇮🇩 Indonesian context: "PB1" = tax, "Service Charge" = service fee
 15. 🏷️ Common Indonesian receipt terms: "Total", "Subtotal", "Pajak", "Servis"
+16. 📅 Transaction date ("Tanggal", "Tgl") as YYYY-MM-DD; Indonesian receipts write dates day first ("12/03/2025" = 2025-03-12); use null if absent
 
 REQUIRED OUTPUT FORMAT:
 
 {{
   'restaurant_name': "Name of the restaurant/business (in Indonesian or English)",
+  'date': "Transaction date as YYYY-MM-DD, or null if not printed",
   'items': [
     {{
       'name': "Item name in Indonesian/English (clean, no extra characters)",
@@ -50,12 +52,12 @@ INDONESIAN EXAMPLES:
 EXAMPLE 1:
 
 INPUT: "WARTEG BAHARI\nNasi Gudeg 15.000\nAyam Goreng 25.000\nEs Teh 5.000\nPajak 4.500\nTotal 49.500"
-OUTPUT: {{'restaurant_name':'WARTEG BAHARI','items':[{{'name':"Nasi Gudeg",'price':15000.0,'quantity':1}},{{'name':"Ayam Goreng",'price':25000.0,'quantity':1}},{{'name':"Es Teh",'price':5000.0,'quantity':1}}],'subtotal':45000.0,'tax':4500.0,'service_charge':0.0,'total':49500.0}}
+OUTPUT: {{'restaurant_name':'WARTEG BAHARI','date':null,'items':[{{'name':"Nasi Gudeg",'price':15000.0,'quantity':1}},{{'name':"Ayam Goreng",'price':25000.0,'quantity':1}},{{'name':"Es Teh",'price':5000.0,'quantity':1}}],'subtotal':45000.0,'tax':4500.0,'service_charge':0.0,'total':49500.0}}
 
 EXAMPLE 2:
 
-INPUT: "CAFE KOPI\n2x Kopi Tubruk @ 12.000\nNasi Goreng 28.000\nService 5%\nTotal 57.600"
-OUTPUT: {{'restaurant_name':'CAFE KOPI','items':[{{'name':"Kopi Tubruk",'price':12000.0,'quantity':2}},{{'name':"Nasi Goreng",'price':28000.0,'quantity':1}}],'subtotal':52000.0,'tax':0.0,'service_charge':2600.0,'total':54600.0}}
+INPUT: "CAFE KOPI\nTgl 12/03/2025 19:40\n2x Kopi Tubruk @ 12.000\nNasi Goreng 28.000\nService 5%\nTotal 57.600"
+OUTPUT: {{'restaurant_name':'CAFE KOPI','date':'2025-03-12','items':[{{'name':"Kopi Tubruk",'price':12000.0,'quantity':2}},{{'name':"Nasi Goreng",'price':28000.0,'quantity':1}}],'subtotal':52000.0,'tax':0.0,'service_charge':2600.0,'total':54600.0}}
 
 IMPORTANT: Your response must be ONLY the JSON object, no markdown formatting, no code blocks, no explanations.
 Handle Indonesian Rupiah formatting correctly (remove dots for thousands, treat as whole numbers).
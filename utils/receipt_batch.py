@@ -0,0 +1,217 @@
+from typing import Optional, List, Dict, Any, Iterable, Union
+
+import numpy as np
+
+from utils.receipt_json import load_receipt_json, parse_amount
+
+# Columnar post-processing for many parsed receipts (the JSON produced by
+# create_receipt_parsing_prompt). Receipts are loaded once into flat NumPy
+# arrays, items are exploded into a single table keyed by receipt index, and
+# every arithmetic check runs vectorized over the whole batch.
+
+
+def _to_amount(value: Any) -> float:
+    amount = parse_amount(value)
+    return np.nan if amount is None else amount
+
+
+class ReceiptBatch:
+    """Receipt-level and item-level columns for a batch of parsed receipts."""
+
+    def __init__(self, ids: List[str], restaurant_names: List[Optional[str]], subtotal: np.ndarray,
+                 tax: np.ndarray, service_charge: np.ndarray, total: np.ndarray, loaded: np.ndarray,
+                 item_receipt_index: np.ndarray, item_names: List[str], item_price: np.ndarray,
+                 item_quantity: np.ndarray):
+        self.ids = ids
+        self.restaurant_names = restaurant_names
+        self.subtotal = subtotal
+        self.tax = tax
+        self.service_charge = service_charge
+        self.total = total
+        self.loaded = loaded
+        self.item_receipt_index = item_receipt_index
+        self.item_names = item_names
+        self.item_price = item_price
+        self.item_quantity = item_quantity
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __str__(self):
+        return (f'ReceiptBatch(receipts: {len(self.ids)}, '
+                f'items: {len(self.item_names)}, '
+                f'unloaded: {int((~self.loaded).sum())})')
+
+    @classmethod
+    def from_receipts(cls, receipts: Iterable[Union[str, Dict[str, Any]]],
+                      ids: Optional[Iterable[str]] = None) -> 'ReceiptBatch':
+        receipts = list(receipts)
+        ids = [str(i) for i in ids] if ids is not None else [str(i) for i in range(len(receipts))]
+        if len(ids) != len(receipts):
+            raise Exception(f'Got {len(ids)} ids for {len(receipts)} receipts')
+        n = len(receipts)
+        restaurant_names: List[Optional[str]] = [None] * n
+        amounts = np.full((n, 4), np.nan)
+        loaded = np.zeros(n, dtype=bool)
+        item_counts = np.zeros(n, dtype=np.int64)
+        item_names: List[str] = []
+        item_prices: List[float] = []
+        item_quantities: List[float] = []
+        for idx, content in enumerate(receipts):
+            data = load_receipt_json(content)
+            if data is None:
+                continue
+            loaded[idx] = True
+            restaurant_name = data.get('restaurant_name')
+            restaurant_names[idx] = str(restaurant_name) if restaurant_name not in (None, '') else None
+            amounts[idx] = (
+                _to_amount(data.get('subtotal')),
+                # tax and service charge are optional: absent and null both mean none was charged
+                _to_amount(0.0 if data.get('tax') is None else data['tax']),
+                _to_amount(0.0 if data.get('service_charge') is None else data['service_charge']),
+                _to_amount(data.get('total')),
+            )
+            items = data.get('items') or []
+            if not isinstance(items, list):
+                continue
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                item_names.append(str(item.get('name') or ''))
+                item_prices.append(_to_amount(item.get('price')))
+                quantity = item.get('quantity', 1)
+                item_quantities.append(_to_amount(1 if quantity is None else quantity))
+                item_counts[idx] += 1
+        return cls(
+            ids=ids,
+            restaurant_names=restaurant_names,
+            subtotal=amounts[:, 0],
+            tax=amounts[:, 1],
+            service_charge=amounts[:, 2],
+            total=amounts[:, 3],
+            loaded=loaded,
+            item_receipt_index=np.repeat(np.arange(n, dtype=np.int64), item_counts),
+            item_names=item_names,
+            item_price=np.asarray(item_prices, dtype=np.float64),
+            item_quantity=np.asarray(item_quantities, dtype=np.float64),
+        )
+
+    def items_total(self) -> np.ndarray:
+        """Sum of price x quantity per receipt; NaN if any item amount is missing."""
+        n = len(self.ids)
+        line_totals = self.item_price * self.item_quantity
+        bad_lines = np.isnan(line_totals)
+        # bincount returns int64 when there are no items at all, so cast before writing NaN
+        sums = np.bincount(self.item_receipt_index, weights=np.where(bad_lines, 0.0, line_totals),
+                           minlength=n).astype(np.float64)
+        has_bad = np.bincount(self.item_receipt_index, weights=bad_lines, minlength=n) > 0
+        sums[has_bad] = np.nan
+        return sums
+
+
+class ReconciliationResult:
+    def __init__(self, batch: ReceiptBatch, items_total: np.ndarray, tax_rate: np.ndarray,
+                 flags: Dict[str, np.ndarray]):
+        self.batch = batch
+        self.items_total = items_total
+        self.tax_rate = tax_rate
+        self.flags = flags
+
+    @property
+    def flagged(self) -> np.ndarray:
+        mask = np.zeros(len(self.batch), dtype=bool)
+        for flag in self.flags.values():
+            mask |= flag
+        return mask
+
+    @property
+    def clean(self) -> np.ndarray:
+        return ~self.flagged
+
+    def reparse_list(self) -> List[Dict[str, Any]]:
+        """Flagged receipts with the names of the checks they failed, in batch order."""
+        names = list(self.flags)
+        stacked = np.column_stack([self.flags[name] for name in names]) if names else np.zeros((len(self.batch), 0), dtype=bool)
+        out = []
+        for idx in np.flatnonzero(self.flagged):
+            out.append({
+                'id': self.batch.ids[idx],
+                'reasons': [names[j] for j in np.flatnonzero(stacked[idx])],
+            })
+        return out
+
+    def __str__(self):
+        counts = ', '.join(f'{name}: {int(flag.sum())}' for name, flag in self.flags.items())
+        return (f'ReconciliationResult(receipts: {len(self.batch)}, '
+                f'flagged: {int(self.flagged.sum())}, {counts})')
+
+
+def reconcile_receipts(batch: ReceiptBatch, abs_tolerance: float = 1.0, rel_tolerance: float = 0.005,
+                       min_tax_rate: float = 0.0, max_tax_rate: float = 0.15) -> ReconciliationResult:
+    """Run the arithmetic checks across the whole batch at once.
+
+    Amounts match when they differ by at most max(abs_tolerance, rel_tolerance * expected).
+    The tax rate is tax / subtotal and is flagged outside [min_tax_rate, max_tax_rate]
+    (PB1 and PPN are usually 10-11%).
+    """
+    items_total = batch.items_total()
+    charged_total = batch.subtotal + batch.tax + batch.service_charge
+
+    def _mismatch(actual: np.ndarray, expected: np.ndarray) -> np.ndarray:
+        tolerance = np.maximum(abs_tolerance, rel_tolerance * np.abs(expected))
+        with np.errstate(invalid='ignore'):
+            return ~(np.abs(actual - expected) <= tolerance)
+
+    amounts = np.column_stack([batch.subtotal, batch.tax, batch.service_charge, batch.total])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tax_rate = np.where(batch.subtotal > 0, batch.tax / batch.subtotal, np.nan)
+    has_rate = ~np.isnan(tax_rate)
+    no_items = np.bincount(batch.item_receipt_index, minlength=len(batch)) == 0
+    # items_total is NaN exactly when some item price or quantity is missing
+    missing_item_amount = ~no_items & np.isnan(items_total)
+
+    loaded = batch.loaded
+    flags = {
+        'unparseable': ~loaded,
+        'missing_amount': loaded & (np.isnan(amounts).any(axis=1) | missing_item_amount),
+        'no_items': loaded & no_items,
+        'negative_amount': loaded & (np.nan_to_num(amounts) < 0).any(axis=1),
+        'items_subtotal_mismatch': (loaded & ~no_items & ~missing_item_amount & ~np.isnan(batch.subtotal)
+                                    & _mismatch(items_total, batch.subtotal)),
+        'total_mismatch': loaded & ~np.isnan(charged_total) & ~np.isnan(batch.total) & _mismatch(batch.total, charged_total),
+        'tax_rate_outlier': loaded & has_rate & ((np.nan_to_num(tax_rate) < min_tax_rate) | (np.nan_to_num(tax_rate) > max_tax_rate)),
+    }
+    return ReconciliationResult(batch, items_total, tax_rate, flags)
+
+
+def export_clean_receipts_parquet(result: ReconciliationResult, receipts_path: str, items_path: str) -> int:
+    """Write the receipts that passed every check (and their items) to two Parquet files."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise Exception('pyarrow is required for Parquet export. Please install it with `pip install pyarrow`')
+    batch = result.batch
+    clean = result.clean
+    clean_idx = np.flatnonzero(clean)
+    receipts_table = pa.table({
+        'receipt_id': pa.array([batch.ids[i] for i in clean_idx], type=pa.string()),
+        'restaurant_name': pa.array([batch.restaurant_names[i] for i in clean_idx], type=pa.string()),
+        'subtotal': batch.subtotal[clean_idx],
+        'tax': batch.tax[clean_idx],
+        'service_charge': batch.service_charge[clean_idx],
+        'total': batch.total[clean_idx],
+        'items_total': result.items_total[clean_idx],
+        'tax_rate': result.tax_rate[clean_idx],
+    })
+    item_idx = np.flatnonzero(clean[batch.item_receipt_index])
+    items_table = pa.table({
+        'receipt_id': pa.array([batch.ids[i] for i in batch.item_receipt_index[item_idx]], type=pa.string()),
+        'name': pa.array([batch.item_names[i] for i in item_idx], type=pa.string()),
+        'price': batch.item_price[item_idx],
+        'quantity': batch.item_quantity[item_idx],
+        'line_total': batch.item_price[item_idx] * batch.item_quantity[item_idx],
+    })
+    pq.write_table(receipts_table, receipts_path)
+    pq.write_table(items_table, items_path)
+    return len(clean_idx)
@@ -0,0 +1,81 @@
+import ast
+import json
+import re
+from typing import Optional, Dict, Any, Union
+
+_AMOUNT_STRIP_PATTERN = re.compile(r'(?i)rp\.?|idr|\s')
+_PY_LITERAL_TOKEN_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"|\'((?:[^\'\\]|\\.)*)\'|\b(True|False|None)\b')
+# String literals with no quotes or backslashes inside; when these account for every quote
+# in the text, swapping ' for " is an exact rewrite of the quoting.
+_SIMPLE_STRING_LITERAL_PATTERN = re.compile(r'\'[^\'"\\]*\'|"[^\'"\\]*"')
+_PY_LITERAL_JSON_WORDS = {'True': 'true', 'False': 'false', 'None': 'null'}
+
+
+def _py_literal_token_to_json(match: re.Match) -> str:
+    if match.group(1) is not None:
+        value = match.group(1)
+        if '\\' in value:
+            value = ast.literal_eval(match.group(0))
+        return json.dumps(value, ensure_ascii=False)
+    if match.group(2) is not None:
+        return _PY_LITERAL_JSON_WORDS[match.group(2)]
+    return match.group(0)
+
+
+def load_receipt_json(content: Union[str, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Decode one parsed receipt, accepting the single-quoted dicts the parsing prompt asks for."""
+    if isinstance(content, dict):
+        return content
+    if not isinstance(content, str) or not content.strip():
+        return None
+    text = content.strip()
+    if text.startswith('```'):
+        text = text.strip('`')
+        if text.lower().startswith('json'):
+            text = text[4:]
+    # The parsing prompt asks for a Python-style single-quoted dict. Decide the quote style
+    # from the first key so each record costs one json.loads instead of a failed json.loads
+    # followed by ast.literal_eval. The blind quote swap is only used when every quote belongs
+    # to a simple literal; apostrophes, nested quotes or escapes take the tokenizing rewrite.
+    if text[1:].lstrip()[:1] == "'":
+        rest = _SIMPLE_STRING_LITERAL_PATTERN.sub('', text)
+        if "'" in rest or '"' in rest or '\\' in rest:
+            attempts = (lambda: _PY_LITERAL_TOKEN_PATTERN.sub(_py_literal_token_to_json, text),)
+        else:
+            attempts = (lambda: text.replace("'", '"'), lambda: _PY_LITERAL_TOKEN_PATTERN.sub(_py_literal_token_to_json, text))
+    else:
+        attempts = (lambda: text, lambda: _PY_LITERAL_TOKEN_PATTERN.sub(_py_literal_token_to_json, text))
+    for attempt in attempts:
+        try:
+            data = json.loads(attempt())
+            break
+        except json.JSONDecodeError:
+            continue
+    else:
+        try:
+            data = ast.literal_eval(text)
+        except (ValueError, SyntaxError):
+            return None
+    return data if isinstance(data, dict) else None
+
+
+def parse_amount(value: Any) -> Optional[float]:
+    """Normalize a receipt amount (number or Rupiah string) to a float, or None if it is not one."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = _AMOUNT_STRIP_PATTERN.sub('', str(value))
+    if not text:
+        return None
+    # Indonesian formatting: "55.000" = 55000, "12,50" = 12.50
+    if re.fullmatch(r'-?\d{1,3}(?:\.\d{3})+(?:,\d+)?', text):
+        text = text.replace('.', '').replace(',', '.')
+    elif re.fullmatch(r'-?\d+,\d{1,2}', text):
+        text = text.replace(',', '.')
+    else:
+        text = text.replace(',', '')
+    try:
+        return float(text)
+    except ValueError:
+        return None